@@ -3,20 +3,37 @@
 Module 1: Basic MCP Server - Starter Code
 """
 from dotenv import load_dotenv
-import json
+import asyncio
 import subprocess
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
 import os
+import re
 import sys
-from github import Github
-from typing import Optional
+import time
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Optional
 import aiohttp
+import orjson
 
 from mcp.server.fastmcp import FastMCP
 load_dotenv()
 
+@asynccontextmanager
+async def _lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Close the shared HTTP session on the serving event loop when the server shuts down."""
+    global _SESSION
+    try:
+        yield
+    finally:
+        if _SESSION is not None:
+            await _SESSION.close()
+            _SESSION = None
+
 # Initialize the FastMCP server
-mcp = FastMCP("pr-agent")
+mcp = FastMCP("pr-agent", lifespan=_lifespan)
 
 # PR template directory (shared across all modules)
 if getattr(sys, 'frozen', False):
@@ -32,8 +49,12 @@ else:
 
 
 
+def _dump(obj: Any) -> str:
+    """Serialize a tool result to indented JSON."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
 # Default PR templates
-DEFAULT_TEMPLATES = {
+DEFAULT_TEMPLATES = MappingProxyType({
     "bug.md": "Bug Fix",
     "feature.md": "Feature",
     "docs.md": "Documentation",
@@ -41,10 +62,22 @@ DEFAULT_TEMPLATES = {
     "test.md": "Test",
     "performance.md": "Performance",
     "security.md": "Security"
-}
+})
+
+# Templates are static, so read them once at import rather than on every tool call
+_TEMPLATE_CACHE = [
+    {
+        "filename": filename,
+        "type": template_type,
+        "content": (TEMPLATES_DIR / filename).read_text()
+    }
+    for filename, template_type in DEFAULT_TEMPLATES.items()
+]
+_TEMPLATE_JSON = _dump(_TEMPLATE_CACHE)
+_TEMPLATES_BY_FILENAME = {t["filename"]: t for t in _TEMPLATE_CACHE}
 
 # Type mapping for PR templates
-TYPE_MAPPING = {
+TYPE_MAPPING = MappingProxyType({
     "bug": "bug.md",
     "fix": "bug.md",
     "feature": "feature.md",
@@ -58,19 +91,75 @@ TYPE_MAPPING = {
     "performance": "performance.md",
     "optimization": "performance.md",
     "security": "security.md"
-}
+})
+
+# Resolve each change type straight to its cached template
+_TYPE_TO_TEMPLATE = {change_type: _TEMPLATES_BY_FILENAME[filename] for change_type, filename in TYPE_MAPPING.items()}
+_DEFAULT_TEMPLATE = _TEMPLATES_BY_FILENAME["feature.md"]
+
+@lru_cache(maxsize=64)
+def _resolve_template(change_type: str) -> dict:
+    """Return the template for a change type (case-insensitive), defaulting to the feature template."""
+    return _TYPE_TO_TEMPLATE.get(change_type.lower(), _DEFAULT_TEMPLATE)
 
 EVENTS_URL = "http://localhost:8080/events"
 
+GITHUB_API_URL = "https://api.github.com"
+# "owner/repo"; anything else could redirect the authenticated request to another API path
+_REPO_NAME_PATTERN = re.compile(r"[\w.-]+/[\w.-]+", re.ASCII)
+
+# Set MCP_PR_AGENT_DEBUG=1 to include roots and working directory details in analyze_file_changes
+DEBUG = os.getenv("MCP_PR_AGENT_DEBUG") == "1"
+
+# Shared HTTP session, created lazily on first use so keep-alive connections are reused across tool calls
+_SESSION: Optional[aiohttp.ClientSession] = None
+_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5)
+# The connector is bound to the running event loop, so only its settings live at module scope.
+# ttl_dns_cache avoids a DNS lookup per request for remote events or Slack hosts
+_CONNECTOR_KWARGS = dict(limit=100, limit_per_host=20, keepalive_timeout=30, ttl_dns_cache=300)
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use."""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            timeout=_TIMEOUT,
+            connector=aiohttp.TCPConnector(**_CONNECTOR_KWARGS)
+        )
+    return _SESSION
+
+# Short-lived cache of the events feed; prompts call several event tools back-to-back
+_EVENTS_TTL = 1.5
+_EVENTS_CACHE: tuple[float, Any] | None = None
+_EVENTS_LOCK = asyncio.Lock()
+
 async def _get_events():
-    """Fetch events from the EVENTS_URL endpoint and return the JSON data asynchronously."""
-    try:
-        async with aiohttp.ClientSession() as session:
+    """Fetch events from the EVENTS_URL endpoint and return the JSON data asynchronously.
+
+    Successful responses are cached for _EVENTS_TTL seconds, and concurrent callers
+    share a single in-flight request.
+    """
+    global _EVENTS_CACHE
+    if _EVENTS_CACHE and time.monotonic() - _EVENTS_CACHE[0] < _EVENTS_TTL:
+        return _EVENTS_CACHE[1]
+    async with _EVENTS_LOCK:
+        # Another caller may have refreshed the cache while we waited for the lock
+        if _EVENTS_CACHE and time.monotonic() - _EVENTS_CACHE[0] < _EVENTS_TTL:
+            return _EVENTS_CACHE[1]
+        try:
+            session = await _get_session()
             async with session.get(EVENTS_URL) as response:
                 response.raise_for_status()
-                return await response.json()
-    except Exception as e:
-        return {"error": f"Failed to fetch events: {e}"}
+                data = orjson.loads(await response.read())
+        except Exception as e:
+            return {"error": f"Failed to fetch events: {e}"}
+        _EVENTS_CACHE = (time.monotonic(), data)
+        return data
+
+def _code_fence(text: str) -> str:
+    """Return a backtick fence longer than any backtick run in text (at least three)."""
+    longest = max((len(run) for run in re.findall(r"`+", text)), default=0)
+    return "`" * max(3, longest + 1)
 
 @mcp.tool()
 async def analyze_file_changes(
@@ -81,6 +170,10 @@ async def analyze_file_changes(
 ) -> str:
     """Get the full diff and list of changed files in the current git repository.
     
+    Returns the change metadata as JSON. When include_diff is set, the diff itself
+    follows the JSON as a fenced diff block (``` or longer if the diff contains backticks)
+    rather than being escaped into a string field.
+    
     Args:
         base_branch: Base branch to compare against (default: main)
         include_diff: Include the full diff content (default: true)
@@ -89,68 +182,62 @@ async def analyze_file_changes(
     """
     try:
         # context.session.send_log_message(level="info",data="Server started successfully")
-        # Try to get working directory from roots first
-        if working_directory is None:
+        # Fetch roots once; they resolve the working directory and feed the debug info.
+        # Without debugging, they're only needed when no working directory was given
+        roots_result = None
+        roots_check = None
+        if working_directory is None or DEBUG:
             try:
                 context = mcp.get_context()
                 roots_result = await context.session.list_roots()
-                # Get the first root - Claude Code sets this to the CWD
-                root = roots_result.roots[0]
-                # FileUrl object has a .path property that gives us the path directly
-                working_directory = root.uri.path
-            except Exception:
+            except Exception as e:
                 # If we can't get roots, fall back to current directory
-                pass
+                roots_check = {
+                    "found": False,
+                    "error": str(e)
+                }
+
+        if roots_result is not None and working_directory is None and roots_result.roots:
+            # Get the first root - Claude Code sets this to the CWD
+            # FileUrl object has a .path property that gives us the path directly
+            working_directory = roots_result.roots[0].uri.path
         
         # Use provided working directory or current directory
         cwd = working_directory if working_directory else os.getcwd()
         
-        # Debug output
-        debug_info = {
-            "provided_working_directory": working_directory,
-            "actual_cwd": cwd,
-            "server_process_cwd": os.getcwd(),
-            "server_file_location": str(Path(__file__).parent),
-            "roots_check": None
-        }
+        analysis = await _get_git_changes(cwd, base_branch, include_diff, max_diff_lines)
         
-        # Add roots debug info
-        try:
-            context = mcp.get_context()
-            roots_result = await context.session.list_roots()
-            debug_info["roots_check"] = {
-                "found": True,
-                "count": len(roots_result.roots),
-                "roots": [str(root.uri) for root in roots_result.roots]
-            }
-        except Exception as e:
-            debug_info["roots_check"] = {
-                "found": False,
-                "error": str(e)
+        if DEBUG:
+            if roots_result is not None:
+                roots_check = {
+                    "found": True,
+                    "count": len(roots_result.roots),
+                    "roots": [str(root.uri) for root in roots_result.roots]
+                }
+            analysis["_debug"] = {
+                "provided_working_directory": working_directory,
+                "actual_cwd": cwd,
+                "server_process_cwd": os.getcwd(),
+                "server_file_location": str(Path(__file__).parent),
+                "roots_check": roots_check
             }
         
-        analysis = await _get_git_changes(cwd, base_branch, include_diff, max_diff_lines)
-        analysis["_debug"] = debug_info
-        
-        return json.dumps(analysis, indent=2)
+        if not include_diff or "error" in analysis:
+            return _dump(analysis)
+        # Hand the diff over as raw text. Context lines of diffed Markdown can hold an
+        # indented ``` that would close a plain fence, so use a longer backtick fence
+        diff = analysis.pop("diff")
+        fence = _code_fence(diff)
+        return f"{_dump(analysis)}\n\n{fence}diff\n{diff}\n{fence}\n"
         
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return _dump({"error": str(e)})
 
 
 @mcp.tool()
 async def get_pr_templates() -> str:
     """List available PR templates with their content."""
-    templates = [
-        {
-            "filename": filename,
-            "type": template_type,
-            "content": (TEMPLATES_DIR / filename).read_text()
-        }
-        for filename, template_type in DEFAULT_TEMPLATES.items()
-    ]
-    
-    return json.dumps(templates, indent=2)
+    return _TEMPLATE_JSON
 
 
 @mcp.tool()
@@ -162,16 +249,8 @@ async def suggest_template(changes_summary: str, change_type: str) -> str:
         change_type: The type of change you've identified (bug, feature, docs, refactor, test, etc.)
     """
     
-    # Get available templates
-    templates_response = await get_pr_templates()
-    templates = json.loads(templates_response)
-    
     # Find matching template
-    template_file = TYPE_MAPPING.get(change_type.lower(), "feature.md")
-    selected_template = next(
-        (t for t in templates if t["filename"] == template_file),
-        templates[0]  # Default to first template if no match
-    )
+    selected_template = _resolve_template(change_type)
     
     suggestion = {
         "recommended_template": selected_template,
@@ -180,7 +259,7 @@ async def suggest_template(changes_summary: str, change_type: str) -> str:
         "usage_hint": "Claude can help you fill out this template based on the specific changes in your PR."
     }
     
-    return json.dumps(suggestion, indent=2)
+    return _dump(suggestion)
 
 
 @mcp.tool()
@@ -202,22 +281,41 @@ async def create_github_pull_request(
     """
     github_token = os.getenv('GITHUB_TOKEN')
     if not github_token:
-        return json.dumps({"error": "GitHub Token not found. Please set GITHUB_TOKEN environment variable."})
+        return _dump({"error": "GitHub Token not found. Please set GITHUB_TOKEN environment variable."})
+
+    # "." and ".." match the pattern but would be normalized out of the URL path
+    if not _REPO_NAME_PATTERN.fullmatch(repo_name) or any(part in (".", "..") for part in repo_name.split("/")):
+        return _dump({"error": f"Invalid repository name: {repo_name!r}. Expected format \"owner/repo\"."})
 
     try:
-        g = Github(github_token)
-        repo = g.get_repo(repo_name)
-        
-        pr = repo.create_pull(
-            title=title,
-            body=body,
-            head=head_branch,
-            base=base_branch
-        )
+        session = await _get_session()
+        payload = {"title": title, "body": body, "head": head_branch, "base": base_branch}
+        headers = {
+            "Authorization": f"Bearer {github_token}",
+            "Accept": "application/vnd.github+json",
+            "Content-Type": "application/json",
+            "X-GitHub-Api-Version": "2022-11-28"
+        }
+        async with session.post(
+            f"{GITHUB_API_URL}/repos/{repo_name}/pulls",
+            data=orjson.dumps(payload),
+            headers=headers
+        ) as response:
+            if response.status != 201:
+                # Error bodies aren't always JSON (e.g. an HTML 5xx from a proxy), so fall back to the raw text
+                resp_text = await response.text()
+                try:
+                    error = orjson.loads(resp_text)
+                except orjson.JSONDecodeError:
+                    error = None
+                if isinstance(error, dict):
+                    return _dump({"error": f"Failed to create PR: {response.status} - {error.get('message')}", "details": error.get("errors")})
+                return _dump({"error": f"Failed to create PR: {response.status} - {resp_text}"})
+            data = orjson.loads(await response.read())
         
-        return json.dumps({"success": True, "pr_url": pr.html_url, "pr_number": pr.number}, indent=2)
+        return _dump({"success": True, "pr_url": data["html_url"], "pr_number": data["number"]})
     except Exception as e:
-        return json.dumps({"error": f"Failed to create PR: {e}"}, indent=2)
+        return _dump({"error": f"Failed to create PR: {e}"})
 
 
 @mcp.tool()
@@ -235,48 +333,84 @@ async def get_local_file_changes(working_directory: str | None = None) -> str:
         
         cwd = working_directory if working_directory else os.getcwd()
 
-        # Get status of files (staged, unstaged, untracked)
-        status_result = subprocess.run(
-            ["git", "status", "--porcelain"],
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        status_output = status_result.stdout.strip().splitlines()
-
-        # Get unstaged changes (diff of working tree vs index)
-        unstaged_diff_result = subprocess.run(
-            ["git", "diff"],
-            cwd=cwd,
-            capture_output=True,
-            text=True
+        # Status (staged, unstaged, untracked), unstaged diff (working tree vs index)
+        # and staged diff (index vs HEAD) are independent, so run them concurrently
+        status, unstaged_diff, staged_diff = await _gather_git(
+            _run_git(["status", "--porcelain"], cwd),
+            _run_git(["diff"], cwd, check=False),
+            _run_git(["diff", "--staged"], cwd, check=False)
         )
-        unstaged_diff = unstaged_diff_result.stdout
-
-        # Get staged changes (diff of index vs HEAD)
-        staged_diff_result = subprocess.run(
-            ["git", "diff", "--staged"],
-            cwd=cwd,
-            capture_output=True,
-            text=True
-        )
-        staged_diff = staged_diff_result.stdout
+        status_output = status.strip().splitlines()
 
-        return json.dumps({
+        return _dump({
             "status": status_output,
             "unstaged_diff": unstaged_diff,
             "staged_diff": staged_diff,
             "working_directory": cwd
-        }, indent=2)
+        })
     
     except subprocess.CalledProcessError as e:
-        return json.dumps({"error": f"Git command failed: {e.stderr}"})
+        return _dump({"error": f"Git command failed: {e.stderr}"})
     except Exception as e:
-        return json.dumps({"error": f"Failed to get local file changes: {e}"})
+        return _dump({"error": f"Failed to get local file changes: {e}"})
 
 # ===== Module 2: New GitHub Actions Tools =====
 
+# Latest workflow statuses for the most recently indexed events list: (events, all workflows, by lowercased name)
+_WORKFLOW_STATUS_INDEX: tuple[Any, list[dict], dict[str, list[dict]]] | None = None
+
+def _latest_workflow_statuses(events: list, workflow_name: Optional[str] = None) -> list[dict]:
+    """Return the latest run status of each workflow in events, most recent first.
+
+    With workflow_name, each workflow's latest run under that name (case-insensitive)
+    is returned, so a renamed workflow still reports its runs under the old name.
+    The index is memoized against the events list itself, so tool calls served from
+    the same cached feed reuse one pass over the event history.
+    """
+    global _WORKFLOW_STATUS_INDEX
+    if _WORKFLOW_STATUS_INDEX is None or _WORKFLOW_STATUS_INDEX[0] is not events:
+        latest_by_id = {}
+        latest_by_id_and_name = {}
+        for event in events:
+            if event.get("event_type") != "workflow_run":
+                continue
+            run = event.get("workflow_run") or {}
+            workflow_id = run.get("workflow_id")
+            workflow_name_from_event = run.get("name")
+            created_at = run.get("created_at")
+            if not (workflow_id and workflow_name_from_event and created_at):
+                continue
+            status = {
+                "name": workflow_name_from_event,
+                "status": run.get("status"),
+                "conclusion": run.get("conclusion"),
+                "url": run.get("html_url"),
+                "created_at": created_at
+            }
+            # Update if this is a newer run for the same workflow (and for the same workflow name)
+            for statuses, key in (
+                (latest_by_id, workflow_id),
+                (latest_by_id_and_name, (workflow_id, workflow_name_from_event.lower()))
+            ):
+                current = statuses.get(key)
+                if current is None or created_at > current["created_at"]:
+                    statuses[key] = status
+        # Sort by creation date (most recent first)
+        by_created_at = itemgetter("created_at")
+        by_name = {}
+        for (_, name), status in latest_by_id_and_name.items():
+            by_name.setdefault(name, []).append(status)
+        for statuses in by_name.values():
+            statuses.sort(key=by_created_at, reverse=True)
+        _WORKFLOW_STATUS_INDEX = (
+            events,
+            sorted(latest_by_id.values(), key=by_created_at, reverse=True),
+            by_name
+        )
+    if workflow_name:
+        return _WORKFLOW_STATUS_INDEX[2].get(workflow_name.lower(), [])
+    return _WORKFLOW_STATUS_INDEX[1]
+
 @mcp.tool()
 async def get_recent_actions_events(limit: int = 10) -> str:
     """Get recent GitHub Actions events received via webhook.
@@ -286,10 +420,10 @@ async def get_recent_actions_events(limit: int = 10) -> str:
     """
     events = await _get_events()
     if isinstance(events, dict) and "error" in events:
-        return json.dumps(events)
+        return _dump(events)
     if not events:
-        return json.dumps({"message": f"No GitHub Actions events received yet. Looked at {EVENTS_URL}"})
-    return json.dumps(events[-limit:], indent=2)
+        return _dump({"message": f"No GitHub Actions events received yet. Looked at {EVENTS_URL}"})
+    return _dump(events[-limit:])
 
 
 @mcp.tool()
@@ -301,38 +435,15 @@ async def get_workflow_status(workflow_name: Optional[str] = None) -> str:
     """
     events = await _get_events()
     if isinstance(events, dict) and "error" in events:
-        return json.dumps(events)
+        return _dump(events)
     if not events:
-        return json.dumps({"message": "No GitHub Actions events received yet. Looked at EVENTS_URL"})
-    workflow_statuses = {}
-    for event in events:
-        if event.get("event_type") == "workflow_run":
-            run = event.get("workflow_run", {})
-            workflow_id = run.get("workflow_id")
-            workflow_name_from_event = run.get("name")
-            status = run.get("status")
-            conclusion = run.get("conclusion")
-            html_url = run.get("html_url")
-            created_at = run.get("created_at")
+        return _dump({"message": "No GitHub Actions events received yet. Looked at EVENTS_URL"})
+    return _dump(_latest_workflow_statuses(events, workflow_name))
 
-            if workflow_id and workflow_name_from_event and created_at:
-                # Only consider if a specific workflow_name is provided and matches
-                if workflow_name and workflow_name.lower() != workflow_name_from_event.lower():
-                    continue
-                # Update if this is a newer run for the same workflow
-                if workflow_id not in workflow_statuses or created_at > workflow_statuses[workflow_id]["created_at"]:
-                    workflow_statuses[workflow_id] = {
-                        "name": workflow_name_from_event,
-                        "status": status,
-                        "conclusion": conclusion,
-                        "url": html_url,
-                        "created_at": created_at
-                    }
-    # Convert dictionary to a list of statuses
-    result = list(workflow_statuses.values())
-    # Sort by creation date (most recent first)
-    result.sort(key=lambda x: x["created_at"], reverse=True)
-    return json.dumps(result, indent=2)
+# Prebuilt pieces of the {"text": message, "mrkdwn": true} Slack payload
+_SLACK_PAYLOAD_PREFIX = b'{"text":'
+_SLACK_PAYLOAD_SUFFIX = b',"mrkdwn":true}'
+_JSON_HEADERS = {"Content-Type": "application/json"}
 
 @mcp.tool()
 async def send_slack_notification(message: str) -> str:
@@ -346,24 +457,22 @@ async def send_slack_notification(message: str) -> str:
         return "Error: SLACK_WEBHOOK_URL environment variable not set"
     
     try:
-        async with aiohttp.ClientSession() as session:
-            payload = {"text": message, "mrkdwn": True}
-            async with session.post(webhook_url, json=payload) as response:
-                if response.status == 200:
-                    return f"Slack notification sent successfully: {message[:50]}..."
-                else:
-                    resp_text = await response.text()
-                    return f"Error sending Slack notification: {response.status} - {resp_text}"
+        session = await _get_session()
+        # The payload shape is fixed, so only the message itself needs JSON encoding
+        payload = _SLACK_PAYLOAD_PREFIX + orjson.dumps(message) + _SLACK_PAYLOAD_SUFFIX
+        async with session.post(webhook_url, data=payload, headers=_JSON_HEADERS) as response:
+            if response.status == 200:
+                return f"Slack notification sent successfully: {message[:50]}..."
+            else:
+                resp_text = await response.text()
+                return f"Error sending Slack notification: {response.status} - {resp_text}"
     except Exception as e:
         return f"Error sending message: {str(e)}"
 
 
 # ===== New Module 2: MCP Prompts =====
 
-@mcp.prompt()
-async def analyze_ci_results():
-    """Analyze recent CI/CD results and provide insights."""
-    return """Please analyze the recent CI/CD results from GitHub Actions:
+_ANALYZE_CI_RESULTS_PROMPT = """Please analyze the recent CI/CD results from GitHub Actions:
 
 1. First, call get_recent_actions_events() to fetch the latest CI/CD events
 2. Then call get_workflow_status() to check current workflow states
@@ -378,11 +487,13 @@ Format your response as:
 - **Recommendations**: [Specific actions to take]
 - **Trends**: [Any patterns you notice]"""
 
-
 @mcp.prompt()
-async def create_deployment_summary():
-    """Generate a deployment summary for team communication."""
-    return """Create a deployment summary for team communication:
+async def analyze_ci_results():
+    """Analyze recent CI/CD results and provide insights."""
+    return _ANALYZE_CI_RESULTS_PROMPT
+
+
+_CREATE_DEPLOYMENT_SUMMARY_PROMPT = """Create a deployment summary for team communication:
 
 1. Check workflow status with get_workflow_status()
 2. Look specifically for deployment-related workflows
@@ -401,11 +512,13 @@ Format as a concise message suitable for Slack:
 
 Keep it brief but informative for team awareness."""
 
-
 @mcp.prompt()
-async def generate_pr_status_report():
-    """Generate a comprehensive PR status report including CI/CD results."""
-    return """Generate a comprehensive PR status report:
+async def create_deployment_summary():
+    """Generate a deployment summary for team communication."""
+    return _CREATE_DEPLOYMENT_SUMMARY_PROMPT
+
+
+_GENERATE_PR_STATUS_REPORT_PROMPT = """Generate a comprehensive PR status report:
 
 1. Use analyze_file_changes() to understand what changed
 2. Use get_workflow_status() to check CI/CD status
@@ -438,11 +551,13 @@ Create a detailed report with:
 - [Breaking changes]
 - [Dependencies affected]"""
 
-
 @mcp.prompt()
-async def troubleshoot_workflow_failure():
-    """Help troubleshoot a failing GitHub Actions workflow."""
-    return """Help troubleshoot failing GitHub Actions workflows:
+async def generate_pr_status_report():
+    """Generate a comprehensive PR status report including CI/CD results."""
+    return _GENERATE_PR_STATUS_REPORT_PROMPT
+
+
+_TROUBLESHOOT_WORKFLOW_FAILURE_PROMPT = """Help troubleshoot failing GitHub Actions workflows:
 
 1. Use get_recent_actions_events() to find recent failures
 2. Use get_workflow_status() to see which workflows are failing
@@ -486,12 +601,14 @@ Structure your response as:
 - [Relevant documentation links]
 - [Similar issues or solutions]"""
 
+@mcp.prompt()
+async def troubleshoot_workflow_failure():
+    """Help troubleshoot a failing GitHub Actions workflow."""
+    return _TROUBLESHOOT_WORKFLOW_FAILURE_PROMPT
+
 # ===== New Module 3: Slack Formatting Prompts =====
 
-@mcp.prompt()
-async def format_ci_failure_alert():
-    """Create a Slack alert for CI/CD failures with rich formatting."""
-    return """Format this GitHub Actions failure as a Slack message using ONLY Slack markdown syntax:
+_FORMAT_CI_FAILURE_ALERT_PROMPT = """Format this GitHub Actions failure as a Slack message using ONLY Slack markdown syntax:
 
 ❌ *CI Failed* - [Repository Name]
 
@@ -517,11 +634,13 @@ Other Slack formats:
 - > text for quotes
 - • for bullets"""
 
-
 @mcp.prompt()
-async def format_ci_success_summary():
-    """Create a Slack message celebrating successful deployments."""
-    return """Format this successful GitHub Actions run as a Slack message using ONLY Slack markdown syntax:
+async def format_ci_failure_alert():
+    """Create a Slack alert for CI/CD failures with rich formatting."""
+    return _FORMAT_CI_FAILURE_ALERT_PROMPT
+
+
+_FORMAT_CI_SUCCESS_SUMMARY_PROMPT = """Format this successful GitHub Actions run as a Slack message using ONLY Slack markdown syntax:
 
 ✅ *Deployment Successful* - [Repository Name]
 
@@ -546,69 +665,146 @@ Other Slack formats:
 - > text for quotes
 - • for bullets"""
 
+@mcp.prompt()
+async def format_ci_success_summary():
+    """Create a Slack message celebrating successful deployments."""
+    return _FORMAT_CI_SUCCESS_SUMMARY_PROMPT
+
+async def _run_git(args: list[str], cwd: str, check: bool = True, text: bool = True) -> str | bytes:
+    """Run a git command without blocking the event loop and return its stdout.
+
+    Stdout is decoded unless text is false, in which case the raw bytes are returned.
+    Raises subprocess.CalledProcessError on a non-zero exit when check is true.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    out, err = await proc.communicate()
+    if check and proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, ["git", *args], out.decode(), err.decode())
+    return out.decode() if text else out
+
+async def _run_git_head(args: list[str], cwd: str, max_lines: int) -> tuple[str, int]:
+    """Run a git command and return its first max_lines lines plus the total line count.
+
+    Output past max_lines is counted but never kept, so memory stays bounded by max_lines
+    no matter how large the output is. Raises subprocess.CalledProcessError on a non-zero exit.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    # Drain stderr alongside stdout so a chatty git can't block on a full pipe
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+    head = bytearray()
+    line_count = 0
+    last_chunk = b""
+    while chunk := await proc.stdout.read(65536):
+        if line_count <= max_lines:
+            head += chunk
+        line_count += chunk.count(b"\n")
+        last_chunk = chunk
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        # Count a final line without a trailing newline
+        line_count += 1
+    err = await stderr_task
+    await proc.wait()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, ["git", *args], "", err.decode())
+
+    if line_count > max_lines:
+        head = b"\n".join(head.split(b"\n", max_lines)[:max_lines])
+    return head.decode(), line_count
+
+async def _gather_git(*calls) -> list:
+    """Run git commands concurrently and return their outputs in order.
+
+    Every command is allowed to finish before the first failure is re-raised,
+    so no git process is left running in the background.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+def _parse_raw_numstat(output: bytes) -> tuple[list[str], dict]:
+    """Parse `git diff --raw --numstat -z` output into changed files and per-file line counts.
+
+    Changed files use the same "STATUS\tpath" form as `git diff --name-status`.
+    Statistics map each path to its added/deleted line counts (None for binary files).
+    The output is split as bytes and only the paths that are emitted get decoded.
+    -z output leaves paths unquoted, so non-UTF-8 bytes are backslash-escaped.
+    """
+    changed_files = []
+    statistics = {}
+    fields = output.split(b"\0")
+    i = 0
+    while i < len(fields) and fields[i]:
+        field = fields[i]
+        if field[:1] == b":":
+            # Raw record: ":modes shas STATUS", then one path (two for renames and copies)
+            status = field.rsplit(b" ", 1)[-1].decode()
+            path_count = 2 if status[0] in "RC" else 1
+            paths = [path.decode(errors="backslashreplace") for path in fields[i + 1:i + 1 + path_count]]
+            changed_files.append("\t".join([status, *paths]))
+            i += 1 + path_count
+            continue
+        # Numstat record: "added\tdeleted\tpath", or "added\tdeleted\t" followed by old and new paths
+        added, deleted, path = field.split(b"\t", 2)
+        if not path:
+            path = fields[i + 2]
+            i += 2
+        statistics[path.decode(errors="backslashreplace")] = {
+            "added": int(added) if added != b"-" else None,
+            "deleted": int(deleted) if deleted != b"-" else None
+        }
+        i += 1
+    return changed_files, statistics
+
 async def _get_git_changes(working_dir: str, base_branch: str, include_diff: bool, max_diff_lines: int) -> dict:
     """Helper function to get git changes and diff, callable outside of MCP context."""
-    # Get changed files with status
+    # The changed files, stats, diff and commit log are independent reads, so run them concurrently
+    git_calls = [
+        _run_git(["diff", "--raw", "--numstat", "-z", f"{base_branch}...HEAD"], working_dir, text=False)
+    ]
+    if include_diff:
+        git_calls += [
+            _run_git_head(["diff", f"{base_branch}...HEAD"], working_dir, max_diff_lines),
+            _run_git(["log", "--oneline", f"{base_branch}..HEAD"], working_dir, check=False)
+        ]
     try:
-        result = subprocess.run(
-            ["git", "diff", "--name-status", f"{base_branch}...HEAD"],
-            cwd=working_dir,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        changed_files = [line.strip() for line in result.stdout.strip().split("\n") if line.strip()]
-        stat_result = subprocess.run(
-            ["git", "diff", "--stat", f"{base_branch}...HEAD"],
-            cwd=working_dir,
-            capture_output=True,
-            text=True
-        )
+        raw_numstat, *diff_and_commits = await _gather_git(*git_calls)
     except subprocess.CalledProcessError as e:
         return {"error": f"Git error: {e.stderr}"}
     except Exception as e:
-        return {"error": f"Failed to get changed files or stats: {e}"}
+        return {"error": f"Failed to get git changes: {e}"}
+
+    changed_files, statistics = _parse_raw_numstat(raw_numstat)
 
     diff = ""
     truncated = False
     diff_line_count = 0
+    commits = None
     if include_diff:
-        try:
-            diff_result = subprocess.run(
-                ["git", "diff", f"{base_branch}...HEAD"],
-                cwd=working_dir,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            diff_lines = diff_result.stdout.splitlines()
-            diff_line_count = len(diff_lines)
-            if diff_line_count > max_diff_lines:
-                diff = "\n".join(diff_lines[:max_diff_lines]) + "\n\n... Output truncated. Showing {max_diff_lines} of {len(diff_lines)} lines ...\n... Use max_diff_lines parameter to see more ..."
-                truncated = True
-            else:
-                diff = diff_result.stdout
-            
-            commits_result = subprocess.run(
-                ["git", "log", "--oneline", f"{base_branch}..HEAD"],
-                capture_output=True,
-                text=True,
-                cwd=working_dir
-            )
-        except subprocess.CalledProcessError as e:
-            return {"error": f"Git error: {e.stderr}"}
-        except Exception as e:
-            return {"error": f"Failed to get diff or commits: {e}"}
+        (diff, diff_line_count), commits = diff_and_commits
+        if diff_line_count > max_diff_lines:
+            diff += f"\n\n... Output truncated. Showing {max_diff_lines} of {diff_line_count} lines ...\n... Use max_diff_lines parameter to see more ..."
+            truncated = True
 
     return {
         "changed_files": changed_files,
-        "statistics": stat_result.stdout,
+        "statistics": statistics,
         "diff": diff if include_diff else "Diff not included (set include_diff=true to see full diff)",
         "truncated": truncated,
         "diff_line_count": diff_line_count,
-        "commits": commits_result.stdout if include_diff else None
+        "commits": commits
     }
 
-
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
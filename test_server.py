@@ -5,10 +5,15 @@ Run these tests to validate your implementation
 """
 
 import json
+import re
 import pytest
+import pytest_asyncio
 import asyncio
+import subprocess
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
 # Import your implemented functions
 try:
@@ -16,7 +21,11 @@ try:
         mcp,
         analyze_file_changes,
         get_pr_templates,
-        suggest_template
+        suggest_template,
+        get_workflow_status,
+        create_github_pull_request,
+        _run_git_head,
+        _parse_raw_numstat
     )
     IMPORTS_SUCCESSFUL = True
 except ImportError as e:
@@ -24,6 +33,22 @@ except ImportError as e:
     IMPORT_ERROR = str(e)
 
 
+def fake_run_git(raw_numstat=""):
+    """Build a _run_git stand-in that returns raw_numstat for `git diff --raw` and nothing otherwise."""
+    async def run_git(args, cwd, check=True, text=True):
+        output = raw_numstat if "--raw" in args else ""
+        return output if text else output.encode()
+    return run_git
+
+
+def split_diff_block(result):
+    """Split an analyze_file_changes result into its JSON metadata and trailing diff block."""
+    match = re.fullmatch(r"(.*?)\n\n(`{3,})diff\n(.*)\n\2\n", result, re.S)
+    assert match, "Result should end with a fenced diff block"
+    metadata, _, diff = match.groups()
+    return json.loads(metadata), diff
+
+
 class TestImplementation:
     """Test that the required functions are implemented."""
     
@@ -43,29 +68,176 @@ class TestAnalyzeFileChanges:
     @pytest.mark.asyncio
     async def test_returns_json_string(self):
         """Test that analyze_file_changes returns a JSON string."""
-        with patch('subprocess.run') as mock_run:
-            mock_run.return_value = MagicMock(stdout="", stderr="")
+        with patch('server._run_git', new=fake_run_git()), \
+                patch('server._run_git_head', new_callable=AsyncMock) as mock_run_head:
+            mock_run_head.return_value = ("", 0)
             
             result = await analyze_file_changes(working_directory=Path.cwd().as_posix())
             
             assert isinstance(result, str), "Should return a string"
-            data = json.loads(result)
+            data, _ = split_diff_block(result)
             assert isinstance(data, dict), "Should return a JSON object"
     
     @pytest.mark.asyncio
     async def test_includes_required_fields(self):
         """Test that the result includes expected fields."""
-        with patch('subprocess.run') as mock_run:
-            mock_run.return_value = MagicMock(stdout="M\tfile1.py\n", stderr="")
+        raw_numstat = ":100644 100644 1111111 2222222 M\0file1.py\0" "1\t0\tfile1.py\0"
+        with patch('server._run_git', new=fake_run_git(raw_numstat)), \
+                patch('server._run_git_head', new_callable=AsyncMock) as mock_run_head:
+            mock_run_head.return_value = ("+added line\n", 1)
             
             result = await analyze_file_changes(working_directory=Path.cwd().as_posix())
-            data = json.loads(result)
+            data, diff = split_diff_block(result)
             
             # Check for specific expected fields
             assert "changed_files" in data, "Result should include 'changed_files' key"
-            assert "diff" in data, "Result should include 'diff' key"
+            assert data["changed_files"] == ["M\tfile1.py"], "Changed files should be parsed from git output"
+            assert "+added line" in diff, "Result should include the diff after the JSON"
             assert "truncated" in data, "Result should include 'truncated' key"
             assert "diff_line_count" in data, "Result should include 'diff_line_count' key"
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("debug", [False, True])
+    async def test_debug_info_only_when_enabled(self, debug):
+        """Test that _debug and the roots lookup only happen with MCP_PR_AGENT_DEBUG enabled."""
+        with patch('server.DEBUG', debug), \
+                patch('server._run_git', new=fake_run_git()), \
+                patch('server._run_git_head', new_callable=AsyncMock) as mock_run_head, \
+                patch.object(mcp, 'get_context', side_effect=RuntimeError("no request context")) as mock_get_context:
+            mock_run_head.return_value = ("", 0)
+            
+            result = await analyze_file_changes(working_directory=Path.cwd().as_posix())
+            data, _ = split_diff_block(result)
+        
+        assert ("_debug" in data) == debug
+        if debug:
+            assert data["_debug"]["roots_check"]["found"] is False
+            mock_get_context.assert_called_once()
+        else:
+            # The roots are only needed for debugging when a working directory is given
+            mock_get_context.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_diff_with_code_fence_stays_in_block(self):
+        """Test that ``` lines inside the diff can't close the surrounding fence."""
+        markdown_diff = "@@ -1,5 +1,5 @@\n ```\n-old\n+new\n ```\n"
+        with patch('server._run_git', new=fake_run_git()), \
+                patch('server._run_git_head', new_callable=AsyncMock) as mock_run_head:
+            mock_run_head.return_value = (markdown_diff, 5)
+            
+            result = await analyze_file_changes(working_directory=Path.cwd().as_posix())
+            _, diff = split_diff_block(result)
+            
+            assert result.count("\n````diff\n") == 1, "Fence should be longer than any backtick run in the diff"
+            assert diff == markdown_diff, "The whole diff should come back inside the block"
+
+
+@pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
+class TestParseRawNumstat:
+    """Test parsing of `git diff --raw --numstat -z` output."""
+    
+    def test_parses_renames_binaries_and_unusual_paths(self):
+        """Test that renames, binary files and paths with newlines are parsed correctly."""
+        raw = (
+            b":100644 100644 1111111 1111111 R100\0old name.txt\0new name.txt\0"
+            b":100644 100644 2222222 3333333 M\0image.png\0"
+            b":000000 100644 0000000 4444444 A\0line\nbreak.txt\0"
+            b":100644 100644 5555555 6666666 M\0trailing \0"
+            b":000000 100644 0000000 7777777 A\0caf\xe9.txt\0"
+            b"0\t0\t\0old name.txt\0new name.txt\0"
+            b"-\t-\timage.png\0"
+            b"2\t0\tline\nbreak.txt\0"
+            b"1\t1\ttrailing \0"
+            b"1\t0\tcaf\xe9.txt\0"
+        )
+        
+        changed_files, statistics = _parse_raw_numstat(raw)
+        
+        assert changed_files == [
+            "R100\told name.txt\tnew name.txt",
+            "M\timage.png",
+            "A\tline\nbreak.txt",
+            "M\ttrailing ",
+            "A\tcaf\\xe9.txt"
+        ]
+        assert statistics == {
+            "new name.txt": {"added": 0, "deleted": 0},
+            "image.png": {"added": None, "deleted": None},
+            "line\nbreak.txt": {"added": 2, "deleted": 0},
+            "trailing ": {"added": 1, "deleted": 1},
+            "caf\\xe9.txt": {"added": 1, "deleted": 0}
+        }
+    
+    def test_empty_output(self):
+        """Test that no changes parse to empty results."""
+        assert _parse_raw_numstat(b"") == ([], {})
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """Create a git repository whose feature branch adds ten lines over main."""
+    def git(*args):
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+    git("init", "-b", "main")
+    git("config", "user.email", "test@example.com")
+    git("config", "user.name", "Test")
+    (tmp_path / "a.txt").write_text("base\n")
+    git("add", ".")
+    git("commit", "-m", "base")
+    git("checkout", "-b", "feature")
+    (tmp_path / "a.txt").write_text("base\n" + "".join(f"line {i}\n" for i in range(10)))
+    # A file without a trailing newline, read back verbatim with cat-file
+    (tmp_path / "no_newline.txt").write_text("first\nsecond\nthird")
+    git("add", ".")
+    git("commit", "-m", "feature")
+    return tmp_path
+
+
+@pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
+class TestRunGitHead:
+    """Test the streaming head/count helper used for diffs."""
+    
+    @pytest.mark.asyncio
+    async def test_untruncated_output_matches_git(self, git_repo):
+        """Test that output within the limit is returned whole with the full line count."""
+        expected = subprocess.run(
+            ["git", "diff", "main...HEAD"], cwd=git_repo, capture_output=True, text=True, check=True
+        ).stdout
+        
+        head, line_count = await _run_git_head(["diff", "main...HEAD"], str(git_repo), 500)
+        
+        assert head == expected
+        assert line_count == len(expected.splitlines())
+    
+    @pytest.mark.asyncio
+    async def test_truncated_output_keeps_first_lines(self, git_repo):
+        """Test that output past the limit is counted but not kept."""
+        expected = subprocess.run(
+            ["git", "diff", "main...HEAD"], cwd=git_repo, capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        
+        head, line_count = await _run_git_head(["diff", "main...HEAD"], str(git_repo), 5)
+        
+        assert head.splitlines() == expected[:5]
+        assert line_count == len(expected)
+    
+    @pytest.mark.asyncio
+    async def test_counts_final_line_without_newline(self, git_repo):
+        """Test that a last line without a trailing newline is counted and kept."""
+        args = ["cat-file", "blob", "HEAD:no_newline.txt"]
+        
+        head, line_count = await _run_git_head(args, str(git_repo), 10)
+        assert (head, line_count) == ("first\nsecond\nthird", 3)
+        
+        head, line_count = await _run_git_head(args, str(git_repo), 2)
+        assert (head, line_count) == ("first\nsecond", 3)
+    
+    @pytest.mark.asyncio
+    async def test_raises_on_git_error(self, git_repo):
+        """Test that a failing git command raises CalledProcessError with its stderr."""
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            await _run_git_head(["diff", "missing...HEAD"], str(git_repo), 10)
+        assert "missing" in exc_info.value.stderr
 
 
 @pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
@@ -148,6 +320,208 @@ class TestSuggestTemplate:
             assert isinstance(suggestion, dict), "Should return structured error for starter code"
 
 
+def workflow_run_event(workflow_id, name, created_at, conclusion="success"):
+    """Build a stored workflow_run webhook event."""
+    return {
+        "event_type": "workflow_run",
+        "workflow_run": {
+            "workflow_id": workflow_id,
+            "name": name,
+            "status": "completed",
+            "conclusion": conclusion,
+            "html_url": f"https://github.com/test/repo/actions/runs/{created_at}",
+            "created_at": created_at
+        }
+    }
+
+
+@pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
+class TestGetWorkflowStatus:
+    """Test the get_workflow_status tool."""
+    
+    @pytest.mark.asyncio
+    async def test_latest_run_per_workflow(self):
+        """Test that each workflow reports its most recent run, newest first."""
+        events = [
+            {"event_type": "push"},
+            workflow_run_event(1, "CI", "2024-01-01T00:00:00Z", "failure"),
+            workflow_run_event(1, "CI", "2024-01-03T00:00:00Z"),
+            workflow_run_event(2, "Deploy", "2024-01-02T00:00:00Z")
+        ]
+        with patch('server._get_events', new=AsyncMock(return_value=events)):
+            result = json.loads(await get_workflow_status())
+        
+        assert [(s["name"], s["created_at"], s["conclusion"]) for s in result] == [
+            ("CI", "2024-01-03T00:00:00Z", "success"),
+            ("Deploy", "2024-01-02T00:00:00Z", "success")
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_name_filter_applies_before_latest_run(self):
+        """Test that a renamed workflow still reports its latest run under the requested name."""
+        events = [
+            workflow_run_event(1, "CI", "2024-01-01T00:00:00Z"),
+            workflow_run_event(1, "Build", "2024-01-02T00:00:00Z")
+        ]
+        with patch('server._get_events', new=AsyncMock(return_value=events)):
+            filtered = json.loads(await get_workflow_status("ci"))
+            unfiltered = json.loads(await get_workflow_status())
+        
+        assert [(s["name"], s["created_at"]) for s in filtered] == [("CI", "2024-01-01T00:00:00Z")]
+        assert [(s["name"], s["created_at"]) for s in unfiltered] == [("Build", "2024-01-02T00:00:00Z")]
+
+
+@pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
+class TestGetEventsCache:
+    """Test the TTL cache and single-flight fetch in front of the events endpoint."""
+    
+    @pytest_asyncio.fixture
+    async def events_server(self):
+        """Serve /events locally, counting hits; statuses lists the response code per hit (200 once exhausted)."""
+        import server
+        state = {"hits": 0, "statuses": []}
+        
+        async def handler(request):
+            state["hits"] += 1
+            # Hold the response so concurrent callers overlap
+            await asyncio.sleep(0.05)
+            status = state["statuses"].pop(0) if state["statuses"] else 200
+            if status != 200:
+                return web.Response(text="upstream failure", status=status)
+            return web.json_response([{"event_type": "push", "hit": state["hits"]}])
+        
+        app = web.Application()
+        app.router.add_get("/events", handler)
+        async with TestServer(app) as test_server, server._lifespan(mcp):
+            # A fresh cache, and a lock bound to this test's event loop
+            with patch('server.EVENTS_URL', str(test_server.make_url("/events"))), \
+                    patch('server._EVENTS_CACHE', None), \
+                    patch('server._EVENTS_LOCK', asyncio.Lock()):
+                yield state
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_fetch(self, events_server):
+        """Test that simultaneous callers coalesce into a single upstream GET."""
+        import server
+        results = await asyncio.gather(*[server._get_events() for _ in range(5)])
+        
+        assert events_server["hits"] == 1
+        assert all(result == [{"event_type": "push", "hit": 1}] for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_failed_fetch_is_not_cached(self, events_server):
+        """Test that an upstream error is returned but the next call fetches again."""
+        import server
+        events_server["statuses"] = [500]
+        
+        failed = await server._get_events()
+        recovered = await server._get_events()
+        
+        assert "error" in failed
+        assert recovered == [{"event_type": "push", "hit": 2}]
+        assert events_server["hits"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_refetches_after_ttl(self, events_server):
+        """Test that cached events expire after _EVENTS_TTL."""
+        import server
+        await server._get_events()
+        await server._get_events()
+        assert events_server["hits"] == 1, "A call within the TTL should be served from the cache"
+        
+        with patch('server._EVENTS_TTL', 0):
+            assert await server._get_events() == [{"event_type": "push", "hit": 2}]
+        assert events_server["hits"] == 2
+
+
+@pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
+class TestLifespan:
+    """Test the server lifespan hook."""
+    
+    @pytest.mark.asyncio
+    async def test_closes_shared_session_on_shutdown(self):
+        """Test that the shared HTTP session is closed on the serving loop at shutdown."""
+        import server
+        async with server._lifespan(mcp):
+            session = await server._get_session()
+            assert not session.closed
+        
+        assert session.closed, "Session should be closed when the server shuts down"
+        assert server._SESSION is None, "A later start should create a fresh session"
+
+
+@pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
+class TestCreateGithubPullRequest:
+    """Test the create_github_pull_request tool against a local stand-in for the GitHub API."""
+    
+    async def create_pr(self, handler, repo_name="test/repo"):
+        """Call create_github_pull_request with the GitHub API served by handler."""
+        import server
+        app = web.Application()
+        app.router.add_post("/repos/{owner}/{repo}/pulls", handler)
+        # The lifespan closes the shared session, which is bound to this test's event loop
+        async with TestServer(app) as test_server, server._lifespan(mcp):
+            with patch('server.GITHUB_API_URL', str(test_server.make_url("")).rstrip("/")), \
+                    patch.dict('os.environ', {"GITHUB_TOKEN": "test-token"}):
+                return json.loads(await create_github_pull_request(repo_name, "Title", "Body", "feature"))
+    
+    @pytest.mark.asyncio
+    async def test_success(self):
+        """Test that a created PR returns its URL and number."""
+        async def handler(request):
+            assert request.headers["Authorization"] == "Bearer test-token"
+            assert json.loads(await request.read())["head"] == "feature"
+            return web.json_response({"html_url": "https://github.com/test/repo/pull/7", "number": 7}, status=201)
+        
+        result = await self.create_pr(handler)
+        
+        assert result == {"success": True, "pr_url": "https://github.com/test/repo/pull/7", "pr_number": 7}
+    
+    @pytest.mark.asyncio
+    async def test_json_error_includes_status_and_message(self):
+        """Test that a GitHub API error reports the status and GitHub's message."""
+        async def handler(request):
+            return web.json_response({"message": "Validation Failed", "errors": [{"code": "invalid"}]}, status=422)
+        
+        result = await self.create_pr(handler)
+        
+        assert result["error"] == "Failed to create PR: 422 - Validation Failed"
+        assert result["details"] == [{"code": "invalid"}]
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("repo_name", [
+        "repo",
+        "../user",
+        "owner/..",
+        "owner/repo/pulls",
+        "owner/repo?x=1",
+        "owner/repo#x",
+        "owner/repo\n",
+        "owner/r%2e%2e"
+    ])
+    async def test_rejects_invalid_repo_name(self, repo_name):
+        """Test that a repo_name outside "owner/repo" is rejected before any request is made."""
+        hits = []
+        async def handler(request):
+            hits.append(request.path)
+            return web.json_response({"html_url": "https://github.com/test/repo/pull/7", "number": 7}, status=201)
+        
+        result = await self.create_pr(handler, repo_name)
+        
+        assert result["error"].startswith("Invalid repository name")
+        assert hits == [], "No request should reach the GitHub API"
+    
+    @pytest.mark.asyncio
+    async def test_non_json_error_includes_status(self):
+        """Test that a non-JSON error body (e.g. a proxy's HTML page) still reports the status."""
+        async def handler(request):
+            return web.Response(text="<html>Bad Gateway</html>", status=502, content_type="text/html")
+        
+        result = await self.create_pr(handler)
+        
+        assert result["error"] == "Failed to create PR: 502 - <html>Bad Gateway</html>"
+
+
 @pytest.mark.skipif(not IMPORTS_SUCCESSFUL, reason="Imports failed")
 class TestToolRegistration:
     """Test that tools are properly registered with FastMCP."""